@@ -6,9 +6,36 @@ import threading
 import queue
 import csv
 import math
+import os
+import sys
+import json
+import re
+import mmap
+import array
+import multiprocessing
+import socket
+import selectors
+import secrets
+import hmac
+import stat
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
+import numpy as np
 from matplotlib.figure import Figure
+from matplotlib.colors import LogNorm
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+try:
+    import scipy.sparse as sp
+    import scipy.sparse.linalg as spla
+    from scipy.special import k0
+    HAS_SCIPY = True
+except ImportError:
+    HAS_SCIPY = False
 
 STYLE_CONFIG = {
     "font_normal": ("Calibri", 10),
@@ -20,6 +47,893 @@ STYLE_CONFIG = {
     "green_button": "#4CAF50",
 }
 
+HISTORY_CONFIG = {
+    "plot_buffer_size": 5000,
+    "plot_max_points": 500,
+    "table_max_rows": 500,
+    "journal_dir": "journal",
+}
+
+PORT_DISCOVERY_CONFIG = {
+    "poll_interval": 1.0,
+    "baud_rates": ["9600", "19200", "57600", "115200"],
+    "handshake_command": "PING",
+    "handshake_reply": r"PONG\b",
+    "handshake_timeout": 2.0,
+    # Opening a port pulses DTR, which reboots Arduino/ESP-class boards; wait out the bootloader
+    "handshake_settle": 2.5,
+}
+
+STREAM_CONFIG = {
+    "host": "127.0.0.1",
+    "port": 5760,
+    "subscriber_buffer": 1024,
+    "max_command_bytes": 65536,
+}
+
+TABLE_COLUMNS = ("no", "a", "b", "m", "n", "curr", "volt", "res", "status")
+TABLE_HEADINGS = {"no": "No", "a": "A", "b": "B", "m": "M", "n": "N", "curr": "Current (mA)", "volt": "Voltage (mV)", "res": "Resistivity (Ωm)", "status": "Status"}
+
+def journal_directory():
+    """Journal folder next to the script/executable, or in the user's data folder when that is not writable."""
+    app_dir = os.path.dirname(sys.executable if getattr(sys, "frozen", False) else os.path.abspath(__file__))
+    data_root = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    candidates = [os.path.join(app_dir, HISTORY_CONFIG["journal_dir"]), os.path.join(data_root, "RMCS", HISTORY_CONFIG["journal_dir"])]
+    for folder in candidates:
+        try:
+            os.makedirs(folder, exist_ok=True)
+        except OSError:
+            continue
+        if os.access(folder, os.W_OK):
+            return folder
+    raise OSError(f"No writable journal folder (tried: {', '.join(candidates)})")
+
+JOURNAL_COLUMNS = ["timestamp", "cycle", "step", "A", "B", "M", "N",
+                   "current_mA", "voltage_mV", "geometric_factor", "resistivity_ohm_m", "config"]
+
+PROJECT_MAGIC = b"RMCSPRJ1"
+PROJECT_VERSION = 1
+PROJECT_CONFIG_NAMES = ["Wenner", "Schlumberger", "Dipole-dipole"]
+PROJECT_COLUMNS = [
+    ("timestamp", "d"),
+    ("cycle", "i"),
+    ("step", "i"),
+    ("A", "h"), ("B", "h"), ("M", "h"), ("N", "h"),
+    ("current_mA", "d"),
+    ("voltage_mV", "d"),
+    ("geometric_factor", "d"),
+    ("resistivity_ohm_m", "d"),
+    ("config", "B"),
+]
+
+def read_journal(path):
+    """Parse a measurement journal into typed project columns (manual steps are stored as step 0).
+
+    A final row cut short (e.g. by a power loss mid-write) is skipped with a warning; an
+    unreadable row anywhere else still raises ValueError.
+    """
+    columns = {name: array.array(typecode) for name, typecode in PROJECT_COLUMNS}
+    bad_row = None
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            if bad_row:
+                raise ValueError(f"Unreadable journal row at line {bad_row[0]}: {bad_row[1]}")
+            try:
+                config = row["config"]
+                values = {
+                    "timestamp": datetime.fromisoformat(row["timestamp"]).timestamp(),
+                    "cycle": int(row["cycle"]),
+                    "step": 0 if row["step"] == "Manual" else int(row["step"]),
+                    **{elec: int(row[elec]) for elec in ("A", "B", "M", "N")},
+                    **{name: float(row[name]) for name in ("current_mA", "voltage_mV", "geometric_factor", "resistivity_ohm_m")},
+                    "config": PROJECT_CONFIG_NAMES.index(config) if config in PROJECT_CONFIG_NAMES else 255,
+                }
+            except (ValueError, TypeError, KeyError) as e:
+                bad_row = (reader.line_num, e)
+                continue
+            for name, value in values.items():
+                columns[name].append(value)
+    if bad_row:
+        print(f"⚠️   Skipped incomplete last journal row (line {bad_row[0]}) in {os.path.basename(path)} - {bad_row[1]}")
+    return columns
+
+def write_project(path, metadata, columns):
+    """Write typed columns and session metadata to a binary .rmcs project file."""
+    rows = len(columns["timestamp"])
+    blobs, layout = [], []
+    for name, typecode in PROJECT_COLUMNS:
+        data = array.array(typecode, columns[name])
+        if len(data) != rows:
+            raise ValueError(f"Column '{name}' has {len(data)} rows, expected {rows}")
+        blobs.append(data.tobytes())
+        layout.append({"name": name, "type": typecode, "itemsize": data.itemsize})
+
+    def build_header(offset_base):
+        offset = offset_base
+        for entry, blob in zip(layout, blobs):
+            entry["offset"] = offset
+            offset += (len(blob) + 7) // 8 * 8
+        header = {"version": PROJECT_VERSION, "byteorder": sys.byteorder, "rows": rows,
+                  "config_names": PROJECT_CONFIG_NAMES, "metadata": metadata, "columns": layout}
+        return json.dumps(header, separators=(",", ":")).encode("utf-8")
+
+    # Column offsets depend on the header length, so grow the reserved space until it fits.
+    reserved = 0
+    while True:
+        data_start = (len(PROJECT_MAGIC) + 4 + reserved + 7) // 8 * 8
+        header = build_header(data_start)
+        if len(PROJECT_MAGIC) + 4 + len(header) <= data_start:
+            break
+        reserved = len(header)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(PROJECT_MAGIC)
+        f.write(len(header).to_bytes(4, "little"))
+        f.write(header)
+        f.write(b"\0" * (data_start - f.tell()))
+        for blob in blobs:
+            f.write(blob)
+            f.write(b"\0" * (-len(blob) % 8))
+    os.replace(tmp_path, path)
+
+class ProjectFile:
+    """Read-only, memory-mapped view of a saved .rmcs project; columns are loaded lazily."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            self._file.close()
+            raise ValueError("Not an RMCS project file (empty or unreadable)")
+        self._views = {}
+        try:
+            if self._map[:len(PROJECT_MAGIC)] != PROJECT_MAGIC:
+                raise ValueError("Not an RMCS project file")
+            header_start = len(PROJECT_MAGIC) + 4
+            header_len = int.from_bytes(self._map[len(PROJECT_MAGIC):header_start], "little")
+            header = json.loads(self._map[header_start:header_start + header_len].decode("utf-8"))
+            if not isinstance(header, dict):
+                raise ValueError("Not an RMCS project file")
+            if header.get("version") != PROJECT_VERSION:
+                raise ValueError(f"Unsupported project version: {header.get('version')}")
+            self.rows = header["rows"]
+            self.metadata = header["metadata"]
+            self.config_names = header["config_names"]
+            self._byteorder = header["byteorder"]
+            self._layout = {entry["name"]: entry for entry in header["columns"]}
+            if not isinstance(self.rows, int) or isinstance(self.rows, bool) or self.rows < 0:
+                raise ValueError(f"Corrupt project (invalid row count {self.rows!r})")
+            for name, typecode in PROJECT_COLUMNS:
+                if name not in self._layout:
+                    raise ValueError(f"Corrupt project (column '{name}' is missing)")
+                entry = self._layout[name]
+                offset, itemsize = entry["offset"], entry["itemsize"]
+                if entry["type"] != typecode or not all(isinstance(v, int) and not isinstance(v, bool) for v in (offset, itemsize)) \
+                        or offset < 0 or itemsize <= 0:
+                    raise ValueError(f"Corrupt project (invalid layout for column '{name}')")
+                if offset + self.rows * itemsize > len(self._map):
+                    raise ValueError(f"Corrupt project (column '{name}' extends past the end of the file; truncated?)")
+        except (KeyError, TypeError) as e:
+            self.close()
+            raise ValueError(f"Corrupt project header (missing or invalid field {e})") from e
+        except (ValueError, UnicodeDecodeError):
+            self.close()
+            raise
+
+    def column(self, name):
+        if name not in self._views:
+            entry = self._layout[name]
+            if array.array(entry["type"]).itemsize != entry["itemsize"]:
+                raise ValueError(f"Column '{name}' item size is not supported on this platform")
+            start = entry["offset"]
+            end = start + self.rows * entry["itemsize"]
+            if self._byteorder == sys.byteorder:
+                self._views[name] = memoryview(self._map)[start:end].cast(entry["type"])
+            else:
+                data = array.array(entry["type"], self._map[start:end])
+                data.byteswap()
+                self._views[name] = data
+        return self._views[name]
+
+    def config_name(self, code):
+        return self.config_names[code] if code < len(self.config_names) else "Unknown"
+
+    def close(self):
+        for view in self._views.values():
+            if isinstance(view, memoryview):
+                view.release()
+        self._views = {}
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def downsample_lttb(x, y, threshold):
+    """Reduce a series to `threshold` points with Largest-Triangle-Three-Buckets, keeping its visual shape."""
+    length = len(x)
+    if threshold >= length or threshold < 3:
+        return list(x), list(y)
+
+    sampled_x, sampled_y = [x[0]], [y[0]]
+    bucket_size = (length - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        avg_start = int((i + 1) * bucket_size) + 1
+        avg_end = min(int((i + 2) * bucket_size) + 1, length)
+        avg_x = sum(x[avg_start:avg_end]) / (avg_end - avg_start)
+        avg_y = sum(y[avg_start:avg_end]) / (avg_end - avg_start)
+
+        range_start = int(i * bucket_size) + 1
+        range_end = int((i + 1) * bucket_size) + 1
+        point_ax, point_ay = x[a], y[a]
+        max_area, next_a = -1.0, range_start
+        for j in range(range_start, range_end):
+            area = abs((point_ax - avg_x) * (y[j] - point_ay) - (point_ax - x[j]) * (avg_y - point_ay))
+            if area > max_area:
+                max_area, next_a = area, j
+
+        sampled_x.append(x[next_a]); sampled_y.append(y[next_a])
+        a = next_a
+
+    sampled_x.append(x[-1]); sampled_y.append(y[-1])
+    return sampled_x, sampled_y
+
+def render_plot_image(filepath, x, y, title="Apparent Resistivity Profile", dpi=300):
+    """Render a resistivity profile offscreen with Agg; safe to run in a worker process."""
+    figure = Figure(figsize=(8, 6), dpi=100)
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot(111)
+    axes.plot(x, y, marker='o', linestyle='-')
+    axes.set_title(title)
+    axes.set_xlabel("Measurement Point")
+    axes.set_ylabel("Apparent Resistivity (Ωm)")
+    axes.grid(True)
+    figure.savefig(filepath, dpi=dpi)
+    return filepath
+
+def write_csv_rows(filepath, rows):
+    """Write table rows in the semicolon-delimited export format; safe to run in a worker process."""
+    with open(filepath, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow([TABLE_HEADINGS[col] for col in TABLE_COLUMNS])
+        writer.writerows(rows)
+    return filepath
+
+def table_rows(columns):
+    """Format journal or project columns as data table rows (comma decimals, as shown in the Treeview)."""
+    steps = columns["step"]
+    elec_a, elec_b, elec_m, elec_n = columns["A"], columns["B"], columns["M"], columns["N"]
+    current, voltage, resistivity = columns["current_mA"], columns["voltage_mV"], columns["resistivity_ohm_m"]
+    rows = []
+    for idx in range(len(steps)):
+        curr_str = f"{current[idx]:.2f}".replace('.', ',')
+        volt_str = f"{voltage[idx]:.2f}".replace('.', ',')
+        res_str = f"{resistivity[idx]:.2f}".replace('.', ',')
+        rows.append((steps[idx] if steps[idx] else "Manual", elec_a[idx], elec_b[idx], elec_m[idx], elec_n[idx], curr_str, volt_str, res_str, "Done"))
+    return rows
+
+def export_survey_csv(filepath, source_path):
+    """Write every record of a journal (.journal.csv) or project (.rmcs) in the CSV export format."""
+    if source_path.lower().endswith(".rmcs"):
+        with ProjectFile(source_path) as project:
+            rows = table_rows({name: project.column(name) for name, _ in PROJECT_COLUMNS})
+    else:
+        rows = table_rows(read_journal(source_path))
+    return write_csv_rows(filepath, rows)
+
+def export_project_report(project_path, output_dir, base_name=None, dpi=300):
+    """Render the plot image and CSV for one saved project into `output_dir` as `<base_name>_Data.csv`/`_Plot.png`."""
+    base_name = base_name or os.path.splitext(os.path.basename(project_path))[0]
+    with ProjectFile(project_path) as project:
+        rows = table_rows({name: project.column(name) for name, _ in PROJECT_COLUMNS})
+        resistivity = project.column("resistivity_ohm_m")
+        plot_x, plot_y = downsample_lttb(list(range(1, project.rows + 1)), list(resistivity), HISTORY_CONFIG["plot_buffer_size"])
+        title = f"{project.metadata.get('project_name', base_name)} [{project.metadata.get('config', '')}]"
+
+    csv_path = write_csv_rows(os.path.join(output_dir, f"{base_name}_Data.csv"), rows)
+    image_path = render_plot_image(os.path.join(output_dir, f"{base_name}_Plot.png"), plot_x, plot_y, title=title, dpi=dpi)
+    return csv_path, image_path
+
+class PortWatcher(threading.Thread):
+    """Background thread that enumerates serial ports and reports ("ports", [...]) whenever the set changes."""
+
+    def __init__(self, event_queue, interval=PORT_DISCOVERY_CONFIG["poll_interval"]):
+        super().__init__(daemon=True)
+        self.event_queue = event_queue
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        known_ports = None
+        while not self._stop_event.is_set():
+            try:
+                ports = sorted(port.device for port in serial.tools.list_ports.comports())
+            except OSError as e:
+                print(f"❌  Port enumeration failed - {e}")
+                ports = known_ports or []
+            if ports != known_ports:
+                known_ports = ports
+                self.event_queue.put(("ports", ports))
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+def is_handshake_reply(line):
+    """True when `line` is the Master's handshake answer (matches PORT_DISCOVERY_CONFIG["handshake_reply"])."""
+    if not line.endswith(b"\n"):
+        return False
+    try:
+        text = line.decode("ascii").strip()
+    except UnicodeDecodeError:
+        return False
+    return re.match(PORT_DISCOVERY_CONFIG["handshake_reply"], text) is not None
+
+def probe_serial_port(port, baud_rates, cancel_event):
+    """Return the first baud rate at which a Master on `port` answers the handshake, or None.
+
+    Anything the device sends on its own (e.g. a GPS receiver's NMEA stream) is drained before
+    the handshake command and ignored afterwards unless it matches the expected reply.
+    """
+    timeout = PORT_DISCOVERY_CONFIG["handshake_timeout"]
+    for baud in baud_rates:
+        if cancel_event.is_set():
+            return None
+        try:
+            with serial.Serial(port, int(baud), timeout=min(timeout, 0.25), write_timeout=timeout) as conn:
+                time.sleep(PORT_DISCOVERY_CONFIG["handshake_settle"])
+                conn.reset_input_buffer()
+                if conn.in_waiting:
+                    conn.read(conn.in_waiting)
+                conn.write((PORT_DISCOVERY_CONFIG["handshake_command"] + '\n').encode('utf-8'))
+                deadline = time.monotonic() + timeout
+                answered, line = False, b""
+                while time.monotonic() < deadline and not cancel_event.is_set():
+                    # readline() returns a partial line on timeout; keep it until the newline arrives
+                    line += conn.readline()
+                    if not line.endswith(b"\n"):
+                        continue
+                    if is_handshake_reply(line):
+                        answered = True
+                        break
+                    line = b""
+        except (serial.SerialException, OSError, ValueError) as e:
+            print(f"🔍  {port} unavailable - {e}")
+            return None
+        if answered:
+            print(f"🔍  Master answered on {port} at {baud} baud: {line.decode('ascii').strip()}")
+            return baud
+        print(f"🔍  No valid answer on {port} at {baud} baud")
+    return None
+
+def detect_master(ports, baud_rates):
+    """Probe all ports concurrently (baud rates in order per port) and return (port, baud) of the first Master found."""
+    if not ports:
+        return None, None
+    cancel_event = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=len(ports))
+    try:
+        futures = {pool.submit(probe_serial_port, port, baud_rates, cancel_event): port for port in ports}
+        for future in as_completed(futures):
+            baud = future.result()
+            if baud:
+                cancel_event.set()
+                return futures[future], baud
+        return None, None
+    finally:
+        cancel_event.set()
+        # Do not wait for probes still blocked in a read; they stop at their next baud rate
+        pool.shutdown(wait=False)
+
+class _StreamClient:
+    """Per-connection state of the stream server: a bounded send buffer and a partial command line."""
+
+    def __init__(self, client_id, sock, buffer_size):
+        self.client_id = client_id
+        self.sock = sock
+        self.buffer_size = buffer_size
+        self.pending = deque()
+        self.outgoing = b""
+        self.incoming = b""
+        self.dropped = 0
+        self.wants_write = False
+        self.authenticated = False
+
+    def enqueue(self, payload):
+        if len(self.pending) >= self.buffer_size:
+            self.dropped += 1
+            return False
+        if self.dropped:
+            self.pending.append(encode_stream_message({"type": "dropped", "count": self.dropped}))
+            self.dropped = 0
+        self.pending.append(payload)
+        return True
+
+    def flush(self):
+        """Send as much as the socket accepts; returns True when everything buffered was written."""
+        while self.outgoing or self.pending:
+            if not self.outgoing:
+                batch = []
+                while self.pending and len(batch) < 64:
+                    batch.append(self.pending.popleft())
+                self.outgoing = b"".join(batch)
+            try:
+                sent = self.sock.send(self.outgoing)
+            except (BlockingIOError, InterruptedError):
+                return False
+            self.outgoing = self.outgoing[sent:]
+        return True
+
+def encode_stream_message(message):
+    return (json.dumps(message, separators=(",", ":")) + "\n").encode("utf-8")
+
+class StreamServer:
+    """Local publish/subscribe server for live readings and remote control.
+
+    Every connection receives published messages as newline-delimited JSON and may send
+    JSON command lines back, which are put on `control_queue` as (client_id, command).
+    Commands are only accepted after a {"cmd": "hello", "token": ...} line carrying this
+    session's `token`; anything that is not a JSON command closes the connection, so a
+    browser or other foreign client cannot slip commands in between rejected lines.
+    All socket I/O runs on one selector thread; `publish` only appends to a queue, so the
+    caller never waits on a subscriber. A subscriber whose buffer is full loses messages
+    and is told how many with a {"type": "dropped"} notice once it catches up.
+    """
+
+    def __init__(self, control_queue, host=STREAM_CONFIG["host"], port=STREAM_CONFIG["port"], unix_path=None,
+                 buffer_size=STREAM_CONFIG["subscriber_buffer"], token=None):
+        self.control_queue = control_queue
+        self.token = token or secrets.token_urlsafe(16)
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self.buffer_size = buffer_size
+        self.clients = {}
+        self.total_dropped = 0
+        self.published = 0
+        self._outbox = deque()
+        self._next_client_id = 1
+        self._running = False
+        self._thread = None
+        self._socket_identity = None
+
+    @property
+    def address(self):
+        return self.unix_path if self.unix_path else f"{self.host}:{self.port}"
+
+    @property
+    def subscriber_count(self):
+        return len(self.clients)
+
+    def start(self):
+        if self.unix_path:
+            if os.path.lexists(self.unix_path):
+                # Only replace a stale socket; never delete a regular file given by mistake
+                if not stat.S_ISSOCK(os.lstat(self.unix_path).st_mode):
+                    raise ValueError(f"'{self.unix_path}' already exists and is not a socket.")
+                os.unlink(self.unix_path)
+            self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                self._listener.bind(self.unix_path)
+            except OSError:
+                self._listener.close()
+                raise
+            created = os.lstat(self.unix_path)
+            self._socket_identity = (created.st_dev, created.st_ino)
+        else:
+            self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            try:
+                # SO_REUSEADDR on Windows lets a second process bind a port already in use
+                if os.name == "nt":
+                    self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_EXCLUSIVEADDRUSE, 1)
+                else:
+                    self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                self._listener.bind((self.host, self.port))
+            except OSError:
+                self._listener.close()
+                raise
+            self.port = self._listener.getsockname()[1]
+        self._listener.listen()
+        self._listener.setblocking(False)
+        self._wake_reader, self._wake_writer = socket.socketpair()
+        self._wake_reader.setblocking(False)
+        self._wake_writer.setblocking(False)
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._listener, selectors.EVENT_READ, "accept")
+        self._selector.register(self._wake_reader, selectors.EVENT_READ, "wake")
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._wake()
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def publish(self, message):
+        self._outbox.append((None, encode_stream_message(message)))
+        self.published += 1
+        self._wake()
+
+    def send_to(self, client_id, message):
+        self._outbox.append((client_id, encode_stream_message(message)))
+        self._wake()
+
+    def _wake(self):
+        try:
+            self._wake_writer.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass
+
+    def _serve(self):
+        try:
+            while self._running:
+                for key, events in self._selector.select(timeout=0.5):
+                    if key.data == "accept":
+                        self._accept()
+                    elif key.data == "wake":
+                        try:
+                            while self._wake_reader.recv(4096):
+                                pass
+                        except (BlockingIOError, InterruptedError):
+                            pass
+                    else:
+                        client = key.data
+                        if events & selectors.EVENT_READ:
+                            self._read(client)
+                        if events & selectors.EVENT_WRITE and client.client_id in self.clients:
+                            self._flush(client)
+                self._fan_out()
+        finally:
+            for client in list(self.clients.values()):
+                self._drop_client(client)
+            self._selector.close()
+            self._listener.close()
+            self._wake_reader.close()
+            self._wake_writer.close()
+            if self.unix_path:
+                self._remove_socket_file()
+
+    def _remove_socket_file(self):
+        """Remove the socket file this server bound, if it is still there and still the same socket."""
+        try:
+            current = os.lstat(self.unix_path)
+        except OSError:
+            return
+        if stat.S_ISSOCK(current.st_mode) and (current.st_dev, current.st_ino) == self._socket_identity:
+            os.unlink(self.unix_path)
+
+    def _accept(self):
+        try:
+            sock, _ = self._listener.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        sock.setblocking(False)
+        client = _StreamClient(self._next_client_id, sock, self.buffer_size)
+        self._next_client_id += 1
+        self.clients[client.client_id] = client
+        self._selector.register(sock, selectors.EVENT_READ, client)
+        print(f"📡  Stream subscriber #{client.client_id} connected ({len(self.clients)} total)")
+
+    def _read(self, client):
+        try:
+            data = client.sock.recv(4096)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b""
+        if not data:
+            return self._drop_client(client)
+        client.incoming += data
+        if len(client.incoming) > STREAM_CONFIG["max_command_bytes"]:
+            return self._drop_client(client)
+        *lines, client.incoming = client.incoming.split(b"\n")
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                command = json.loads(line.decode("utf-8"))
+                if not isinstance(command, dict) or "cmd" not in command:
+                    raise ValueError("expected an object with a 'cmd' field")
+            except (ValueError, UnicodeDecodeError) as e:
+                return self._reject(client, f"Invalid command: {e}")
+            if command["cmd"] == "hello":
+                if not hmac.compare_digest(str(command.get("token", "")).encode("utf-8"), self.token.encode("utf-8")):
+                    return self._reject(client, "Invalid session token.", command.get("id"))
+                client.authenticated = True
+                client.enqueue(encode_stream_message({"type": "reply", "cmd": "hello", "id": command.get("id"), "ok": True, "error": None}))
+                continue
+            if not client.authenticated:
+                return self._reject(client, "Send {\"cmd\": \"hello\", \"token\": ...} before any other command.", command.get("id"))
+            self.control_queue.put((client.client_id, command))
+        self._flush(client)
+
+    def _reject(self, client, error, command_id=None):
+        """Answer with a final error and close the connection."""
+        client.enqueue(encode_stream_message({"type": "reply", "id": command_id, "ok": False, "error": error}))
+        try:
+            client.flush()
+        except OSError:
+            pass
+        print(f"⚠️   Stream subscriber #{client.client_id} rejected - {error}")
+        self._drop_client(client)
+
+    def _fan_out(self):
+        touched = set()
+        while self._outbox:
+            target, payload = self._outbox.popleft()
+            recipients = self.clients.values() if target is None else [self.clients[target]] if target in self.clients else []
+            for client in recipients:
+                if not client.enqueue(payload):
+                    self.total_dropped += 1
+                touched.add(client)
+        for client in touched:
+            if client.client_id in self.clients:
+                self._flush(client)
+
+    def _flush(self, client):
+        try:
+            complete = client.flush()
+        except OSError:
+            return self._drop_client(client)
+        if complete == client.wants_write:
+            client.wants_write = not complete
+            events = selectors.EVENT_READ | (selectors.EVENT_WRITE if client.wants_write else 0)
+            self._selector.modify(client.sock, events, client)
+
+    def _drop_client(self, client):
+        self.clients.pop(client.client_id, None)
+        try:
+            self._selector.unregister(client.sock)
+        except (KeyError, ValueError):
+            pass
+        client.sock.close()
+        print(f"📡  Stream subscriber #{client.client_id} disconnected ({len(self.clients)} total)")
+
+INVERSION_CONFIG = {
+    "cells_per_spacing": 2,
+    "layer_growth": 1.15,
+    "depth_fraction": 0.25,
+    "padding_cells": 6,
+    "padding_growth": 1.8,
+    "wavenumbers": 8,
+    "max_iterations": 8,
+    "lambda_start": 1.0,
+    "lambda_decay": 0.5,
+    "lambda_min": 0.01,
+    "target_rms": 2.0,
+}
+
+def prepare_survey_data(columns, spacing):
+    """Turn journal/project columns into unique quadrupoles with positive apparent resistivities.
+
+    Apparent resistivity is recomputed from raw voltage/current with the exact half-space
+    geometric factor, so every array type is treated consistently; the latest reading wins
+    when a quadrupole was measured more than once.
+    """
+    latest = {}
+    for a, b, m, n, curr, volt in zip(columns["A"], columns["B"], columns["M"], columns["N"], columns["current_mA"], columns["voltage_mV"]):
+        if curr != 0:
+            latest[(a, b, m, n)] = volt / curr
+    quads, rho_a = [], []
+    for (a, b, m, n), resistance in latest.items():
+        xa, xb, xm, xn = ((e - 1) * spacing for e in (a, b, m, n))
+        distances = (abs(xm - xa), abs(xm - xb), abs(xn - xa), abs(xn - xb))
+        if min(distances) == 0:
+            continue
+        geometry = 1 / distances[0] - 1 / distances[1] - 1 / distances[2] + 1 / distances[3]
+        value = abs(2 * math.pi / geometry * resistance) if geometry else 0.0
+        if value > 0 and math.isfinite(value):
+            quads.append((a, b, m, n))
+            rho_a.append(value)
+    return np.array(quads, dtype=int).reshape(-1, 4), np.array(rho_a)
+
+class ResistivityForwardModel:
+    """2.5D DC resistivity forward model: finite volumes on a rectangular mesh, surface point electrodes.
+
+    Each wavenumber is solved with a sparse LU for unit sources at every electrode; potentials are
+    recombined with quadrature weights fitted to 1/r and normalised by the homogeneous response of the
+    same mesh, which cancels most discretisation error. The Jacobian uses reciprocity (adjoint fields
+    are the same electrode solutions).
+    """
+
+    def __init__(self, quads, spacing, workers=None):
+        cfg = INVERSION_CONFIG
+        electrodes = np.unique(quads)
+        electrode_x = (electrodes - 1) * spacing
+        dx = spacing / cfg["cells_per_spacing"]
+        x0, x1 = electrode_x.min(), electrode_x.max()
+        n_inner = int(round((x1 - x0) / dx))
+        n_pad = cfg["padding_cells"]
+        pad = np.cumsum(dx * cfg["padding_growth"] ** np.arange(1, n_pad + 1))
+        self.x_nodes = np.concatenate([x0 - pad[::-1], x0 + dx * np.arange(n_inner + 1), x1 + pad])
+
+        spans = (quads.max(axis=1) - quads.min(axis=1)) * spacing
+        depth = max(cfg["depth_fraction"] * spans.max(), 2 * spacing)
+        thickness = [dx / 2]
+        while sum(thickness) < depth:
+            thickness.append(thickness[-1] * cfg["layer_growth"])
+        n_layers = len(thickness)
+        thickness += list(thickness[-1] * cfg["padding_growth"] ** np.arange(1, n_pad + 1))
+        self.z_nodes = np.concatenate([[0.0], np.cumsum(thickness)])
+
+        nnx, nnz = len(self.x_nodes), len(self.z_nodes)
+        nx, nz = nnx - 1, nnz - 1
+        self.n_nodes, self.n_cells = nnx * nnz, nx * nz
+        ix, iz = np.meshgrid(np.arange(nx), np.arange(nz))
+        ix, iz = ix.ravel(), iz.ravel()
+        self.corners = np.stack([iz * nnx + ix, iz * nnx + ix + 1, (iz + 1) * nnx + ix, (iz + 1) * nnx + ix + 1])
+        hx, hz = np.diff(self.x_nodes)[ix], np.diff(self.z_nodes)[iz]
+        self.gx, self.gz, self.mass = hz / (2 * hx), hx / (2 * hz), hx * hz / 4
+
+        n00, n10, n01, n11 = self.corners
+        edge_a = np.concatenate([n00, n01, n00, n10])
+        edge_b = np.concatenate([n10, n11, n01, n11])
+        self.edge_cell = np.tile(np.arange(self.n_cells), 4)
+        self.edge_g = np.concatenate([self.gx, self.gx, self.gz, self.gz])
+        rows = np.arange(len(edge_a))
+        node_j, node_i = np.divmod(np.arange(self.n_nodes), nnx)
+        self.free = np.flatnonzero((node_i > 0) & (node_i < nnx - 1) & (node_j < nnz - 1))
+        incidence = sp.csr_matrix((np.concatenate([np.ones(len(rows)), -np.ones(len(rows))]),
+                                   (np.concatenate([rows, rows]), np.concatenate([edge_b, edge_a]))),
+                                  shape=(len(rows), self.n_nodes))
+        self.incidence = incidence[:, self.free].tocsc()
+        self.node_mass = sp.csr_matrix((np.tile(self.mass, 4), (self.corners.ravel(), np.tile(np.arange(self.n_cells), 4))),
+                                       shape=(self.n_nodes, self.n_cells))[self.free]
+
+        electrode_nodes = n_pad + np.round((electrode_x - x0) / dx).astype(int)
+        position = {e: k for k, e in enumerate(electrodes)}
+        self.data_index = np.vectorize(position.get)(quads)
+        self.source_dipoles, self.source_index = np.unique(self.data_index[:, :2], axis=0, return_inverse=True)
+        self.receiver_dipoles, self.receiver_index = np.unique(self.data_index[:, 2:], axis=0, return_inverse=True)
+        self.source_index, self.receiver_index = self.source_index.ravel(), self.receiver_index.ravel()
+        free_position = np.full(self.n_nodes, -1)
+        free_position[self.free] = np.arange(len(self.free))
+        self.sources = sp.csc_matrix((np.ones(len(electrodes)), (free_position[electrode_nodes], np.arange(len(electrodes)))),
+                                     shape=(len(self.free), len(electrodes)))
+        self.electrode_nodes = electrode_nodes
+
+        distances = np.abs(electrode_x[:, None] - electrode_x[None, :])
+        r_min, r_max = spacing, max(distances.max(), spacing) * 2
+        self.wavenumbers = np.logspace(np.log10(0.1 / r_max), np.log10(3.0 / r_min), cfg["wavenumbers"])
+        r_fit = np.logspace(np.log10(r_min), np.log10(r_max), 50)
+        self.weights = np.linalg.lstsq(k0(np.outer(r_fit, self.wavenumbers)) * r_fit[:, None], np.ones(len(r_fit)), rcond=None)[0]
+
+        # Parameters: one column per electrode spacing, one row per layer; padding shares the nearest parameter
+        n_cols = max(n_inner // cfg["cells_per_spacing"], 1)
+        param_col = np.clip((ix - n_pad) // cfg["cells_per_spacing"], 0, n_cols - 1)
+        param_row = np.minimum(iz, n_layers - 1)
+        self.param_shape = (n_layers, n_cols)
+        self.param_map = sp.csr_matrix((np.ones(self.n_cells), (np.arange(self.n_cells), param_row * n_cols + param_col)),
+                                       shape=(self.n_cells, n_layers * n_cols))
+        self.param_x = x0 + spacing * np.arange(n_cols + 1)
+        self.param_z = self.z_nodes[:n_layers + 1]
+        self.electrode_x = electrode_x
+
+        self.workers = workers or os.cpu_count() or 1
+        self.reference = None
+        self.reference = self.response(np.ones(self.n_cells))[0]
+
+    def _solve_wavenumber(self, sigma, k, with_jacobian):
+        edge_sigma = sigma[self.edge_cell] * self.edge_g
+        system = (self.incidence.T @ sp.diags(edge_sigma) @ self.incidence + sp.diags(k * k * (self.node_mass @ sigma))).tocsc()
+        fields = np.zeros((self.n_nodes, self.sources.shape[1]))
+        fields[self.free] = spla.splu(system).solve(self.sources.toarray())
+        a, b, m, n = self.data_index.T
+        potentials = fields[self.electrode_nodes]
+        voltage = potentials[m, a] - potentials[m, b] - potentials[n, a] + potentials[n, b]
+        if not with_jacobian:
+            return voltage, None
+        # Bilinear form u_receiver^T A_cell u_source for every datum and cell, built from electrode-major
+        # cell features (edge differences and corner values) of each distinct source and receiver dipole
+        f00, f10, f01, f11 = fields.T[:, self.corners].transpose(1, 0, 2)
+        features = (f10 - f00, f11 - f01, f01 - f00, f11 - f10, f00, f10, f01, f11)
+        mass = k * k * self.mass
+        coefficients = (self.gx, self.gx, self.gz, self.gz, mass, mass, mass, mass)
+        (src_a, src_b), (rec_m, rec_n) = self.source_dipoles.T, self.receiver_dipoles.T
+        bilinear = np.zeros((len(a), self.n_cells))
+        for feature, coefficient in zip(features, coefficients):
+            source = coefficient * (feature[src_a] - feature[src_b])
+            receiver = feature[rec_m] - feature[rec_n]
+            bilinear += source[self.source_index] * receiver[self.receiver_index]
+        return voltage, bilinear
+
+    def response(self, sigma, with_jacobian=False):
+        """Return normalised apparent resistivities and, optionally, d(log rho_a)/d(log rho_cell)."""
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(self.wavenumbers))) as pool:
+            results = list(pool.map(lambda k: self._solve_wavenumber(sigma, k, with_jacobian), self.wavenumbers))
+        voltage = sum(w * v for w, (v, _) in zip(self.weights, results))
+        rho_a = voltage / self.reference if self.reference is not None else voltage
+        if not with_jacobian:
+            return rho_a, None
+        derivative = sum(w * j for w, (_, j) in zip(self.weights, results))
+        # dV/dsigma = -bilinear; d log V / d log rho = (sigma / V) * bilinear
+        jacobian = derivative * sigma[None, :] / voltage[:, None]
+        return rho_a, jacobian
+
+def invert_resistivity(quads, rho_a, spacing, progress=None):
+    """Smoothness-constrained Gauss-Newton inversion of apparent resistivities in log space.
+
+    Returns a dict with the model (Ωm, layers x columns), its x/z cell edges, electrode positions,
+    the RMS misfit history (%) and the elapsed time.
+    """
+    cfg = INVERSION_CONFIG
+    started = time.perf_counter()
+    model = ResistivityForwardModel(quads, spacing)
+    n_rows, n_cols = model.param_shape
+    diff_x = sp.diags([-1.0, 1.0], [0, 1], shape=(max(n_cols - 1, 0), n_cols))
+    diff_z = sp.diags([-1.0, 1.0], [0, 1], shape=(max(n_rows - 1, 0), n_rows))
+    roughness = sp.vstack([sp.kron(sp.identity(n_rows), diff_x), sp.kron(diff_z, sp.identity(n_cols))]).tocsr()
+    smoothing = (roughness.T @ roughness).toarray()
+
+    observed = np.log(rho_a)
+    params = np.full(n_rows * n_cols, np.median(observed))
+
+    def evaluate(params, with_jacobian=False):
+        sigma = np.exp(-(model.param_map @ params))
+        predicted, jacobian = model.response(sigma, with_jacobian)
+        residual = observed - np.log(np.abs(predicted))
+        return residual, (jacobian @ model.param_map if with_jacobian else None)
+
+    residual, jacobian = evaluate(params, True)
+    rms_history = [float(100 * np.sqrt(np.mean(residual ** 2)))]
+    lam = None
+    for iteration in range(1, cfg["max_iterations"] + 1):
+        if rms_history[-1] < cfg["target_rms"]:
+            break
+        normal = jacobian.T @ jacobian
+        if lam is None:
+            lam = cfg["lambda_start"] * np.trace(normal) / max(np.trace(smoothing), 1e-12)
+        step = np.linalg.solve(normal + lam * smoothing, jacobian.T @ residual - lam * smoothing @ params)
+        for _ in range(4):
+            trial_residual, _ = evaluate(params + step)
+            if np.mean(trial_residual ** 2) < np.mean(residual ** 2):
+                break
+            step /= 2
+        else:
+            break
+        params = params + step
+        residual, jacobian = evaluate(params, True)
+        rms_history.append(float(100 * np.sqrt(np.mean(residual ** 2))))
+        if progress:
+            progress(iteration, rms_history[-1])
+        if rms_history[-2] - rms_history[-1] < 0.01 * rms_history[-2]:
+            break
+        lam = max(lam * cfg["lambda_decay"], cfg["lambda_min"] * np.trace(normal) / max(np.trace(smoothing), 1e-12))
+
+    return {
+        "resistivity": np.exp(params).reshape(n_rows, n_cols),
+        "x_edges": model.param_x,
+        "z_edges": model.param_z,
+        "electrode_x": model.electrode_x,
+        "rms_history": rms_history,
+        "data_count": len(rho_a),
+        "elapsed": time.perf_counter() - started,
+    }
+
+def load_survey_columns(path):
+    """Load measurement columns from a journal (.journal.csv) or a saved project (.rmcs)."""
+    if not path.lower().endswith(".rmcs"):
+        return read_journal(path)
+    with ProjectFile(path) as project:
+        return {name: np.array(project.column(name)) for name in ("A", "B", "M", "N", "current_mA", "voltage_mV")}
+
+def run_survey_inversion(path, spacing, progress=None):
+    quads, rho_a = prepare_survey_data(load_survey_columns(path), spacing)
+    if len(rho_a) < 3:
+        raise ValueError(f"Need at least 3 valid measurements for inversion, found {len(rho_a)}.")
+    return invert_resistivity(quads, rho_a, spacing, progress)
+
 class RMCSApp(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -33,22 +947,48 @@ class RMCSApp(tk.Tk):
         self.is_running = False
         self.last_manual_electrodes = {'A': None, 'B': None, 'M': None, 'N': None}
         self.countdown_job = None
+        self.step_job = None
         self.manual_measurement_active = False
 
         self.measurement_sequence = []
         self.current_step = 0
         self.base_spacing = 1.0
-        self.plot_data_x = []
-        self.plot_data_y = []
+        self.plot_data_x = deque(maxlen=HISTORY_CONFIG["plot_buffer_size"])
+        self.plot_data_y = deque(maxlen=HISTORY_CONFIG["plot_buffer_size"])
+        self.monitor_cycle = 0
+        self.manual_row_counter = 0
+
+        self.journal_file = None
+        self.journal_writer = None
+        self.journal_path = None
+        self.loaded_project_path = None
+
+        self.export_executor = None
+        self.export_futures = []
+        self.export_description = ""
+        self.export_on_done = None
+
+        self.stream_server = None
+        self.stream_commands = queue.Queue()
+
+        self.inversion_executor = None
+        self.inversion_future = None
+        self.inversion_messages = queue.Queue()
+        self.inversion_colorbar = None
+
+        self.port_events = queue.Queue()
+        self.port_watcher = None
+        self.auto_connect_active = False
         
         self.project_name = f"RMCS_Project_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         
         self.config_var = tk.StringVar(value="Wenner")
         self.mode_var = tk.StringVar(value="Otomatis")
+        self.monitor_var = tk.BooleanVar(value=False)
 
         self._create_main_layout()
         self._create_all_widgets()
-        self.populate_com_ports()
+        self.start_port_watcher()
 
         self.mode_var.trace_add("write", self.toggle_mode)
         self.config_var.trace_add("write", self.update_title)
@@ -57,6 +997,8 @@ class RMCSApp(tk.Tk):
         self.update_title()
 
         self.process_serial_queue()
+        self.process_stream_commands()
+        self.process_port_events()
 
     def _create_main_layout(self):
         self.grid_columnconfigure(0, weight=1, uniform="group1")
@@ -78,6 +1020,7 @@ class RMCSApp(tk.Tk):
         self._create_progress_frame()
         self._create_data_tab()
         self._create_plot_tab()
+        self._create_inversion_tab()
         self._create_export_tab()
 
     def _create_comms_frame(self):
@@ -87,13 +1030,15 @@ class RMCSApp(tk.Tk):
         self.com_port_combo = ttk.Combobox(frame, state="readonly", width=12)
         self.com_port_combo.grid(row=0, column=1, padx=5, pady=2)
         ttk.Label(frame, text="Baudrate:").grid(row=1, column=0, sticky="w", padx=5, pady=2)
-        self.baud_rate_combo = ttk.Combobox(frame, values=["9600", "19200", "57600", "115200"], width=12)
+        self.baud_rate_combo = ttk.Combobox(frame, values=PORT_DISCOVERY_CONFIG["baud_rates"], width=12)
         self.baud_rate_combo.set("9600")
         self.baud_rate_combo.grid(row=1, column=1, padx=5, pady=2)
         self.connect_button = ttk.Button(frame, text="Connect", command=self.toggle_connection, width=10)
         self.connect_button.grid(row=2, column=0, pady=10, padx=5)
         self.status_label = ttk.Label(frame, text="Not ready", foreground="red", font=STYLE_CONFIG["font_bold"])
         self.status_label.grid(row=2, column=1, pady=10, padx=5)
+        self.auto_connect_button = ttk.Button(frame, text="Auto Connect", command=self.auto_connect)
+        self.auto_connect_button.grid(row=3, column=0, columnspan=2, sticky="ew", padx=5)
 
     def _create_measurement_frame(self):
         frame = ttk.LabelFrame(self.left_panel, text="Measurement", padding=10)
@@ -111,6 +1056,9 @@ class RMCSApp(tk.Tk):
                                           command=lambda: self.on_config_change("Dipole-dipole"))
         self.radio_dipole.pack(anchor="w")
         
+        self.monitor_check = ttk.Checkbutton(frame, text="Loop sequence (monitoring)", variable=self.monitor_var)
+        self.monitor_check.pack(anchor="w", pady=(5, 0))
+        
         self.start_button = ttk.Button(frame, text="START MEASUREMENT (AUTO)", command=self.start_measurement_sequence, style="Accent.TButton")
         self.start_button.pack(fill="x", pady=10)
         
@@ -184,6 +1132,8 @@ class RMCSApp(tk.Tk):
         frame.pack(fill="x", pady=5, side="bottom")
         self.progress_bar = ttk.Progressbar(frame, orient="horizontal", length=200, mode="determinate")
         self.progress_bar.pack(fill="x", expand=True, pady=5)
+        self.stop_button = ttk.Button(frame, text="STOP SEQUENCE", command=self.stop_measurement_sequence, style="Red.TButton")
+        self.stop_button.pack(fill="x", pady=5)
         self.reset_button = ttk.Button(frame, text="RESET SYSTEM", command=self.reset_all, style="Red.TButton")
         self.reset_button.pack(fill="x", pady=5)
 
@@ -200,6 +1150,7 @@ class RMCSApp(tk.Tk):
         self.project_name_entry.insert(0, self.project_name)
         self.project_name_entry.grid(row=0, column=1, padx=5, sticky="ew")
         ttk.Button(cmd_frame, text="Update", command=self.update_project_name).grid(row=0, column=2, padx=5)
+        ttk.Button(cmd_frame, text="Open Project...", command=self.open_project).grid(row=0, column=3, padx=5)
         ttk.Label(cmd_frame, text="Cmd File:").grid(row=1, column=0, padx=5, sticky="w")
         self.file_path_entry = ttk.Entry(cmd_frame, width=50)
         self.file_path_entry.grid(row=1, column=1, padx=5, sticky="ew")
@@ -209,11 +1160,9 @@ class RMCSApp(tk.Tk):
         table_frame.grid(row=1, column=0, sticky="nsew", pady=5)
         table_frame.grid_rowconfigure(0, weight=1)
         table_frame.grid_columnconfigure(0, weight=1)
-        columns = ("no", "a", "b", "m", "n", "curr", "volt", "res", "status")
-        self.tree = ttk.Treeview(table_frame, columns=columns, show="headings")
-        col_map = {"no": "No", "a": "A", "b": "B", "m": "M", "n": "N", "curr": "Current (mA)", "volt": "Voltage (mV)", "res": "Resistivity (Ωm)", "status": "Status"}
-        for col in columns:
-            self.tree.heading(col, text=col_map[col])
+        self.tree = ttk.Treeview(table_frame, columns=TABLE_COLUMNS, show="headings")
+        for col in TABLE_COLUMNS:
+            self.tree.heading(col, text=TABLE_HEADINGS[col])
             self.tree.column(col, anchor="center", width=80)
         scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
         self.tree.configure(yscrollcommand=scrollbar.set)
@@ -235,11 +1184,50 @@ class RMCSApp(tk.Tk):
         toolbar.update()
         self.plot_canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
 
+    def _create_inversion_tab(self):
+        inversion_frame = ttk.Frame(self.notebook, padding=10)
+        self.notebook.add(inversion_frame, text="Inversion")
+        control_frame = ttk.Frame(inversion_frame)
+        control_frame.pack(side=tk.TOP, fill="x", pady=(0, 5))
+        self.inversion_button = ttk.Button(control_frame, text="Run Inversion", command=self.run_inversion, style="Accent.TButton")
+        self.inversion_button.pack(side="left", padx=5)
+        self.inversion_status_label = ttk.Label(control_frame, text="Invert the current session or the opened project", foreground="grey")
+        self.inversion_status_label.pack(side="left", padx=10)
+        self.inversion_figure = Figure(figsize=(8, 6), dpi=100)
+        self.inversion_axes = self.inversion_figure.add_subplot(111)
+        self.inversion_axes.set_title("Inverted Resistivity Model")
+        self.inversion_axes.set_xlabel("Distance (m)")
+        self.inversion_axes.set_ylabel("Depth (m)")
+        self.inversion_canvas = FigureCanvasTkAgg(self.inversion_figure, master=inversion_frame)
+        self.inversion_canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        toolbar = NavigationToolbar2Tk(self.inversion_canvas, inversion_frame)
+        toolbar.update()
+
     def _create_export_tab(self):
         export_frame = ttk.Frame(self.notebook, padding=20)
         self.notebook.add(export_frame, text="Export")
         ttk.Button(export_frame, text="Export Data to CSV", command=self.export_to_csv, style="Accent.TButton").pack(pady=10, fill="x")
         ttk.Button(export_frame, text="Save Plot as Image", command=self.save_plot_image, style="Accent.TButton").pack(pady=10, fill="x")
+        ttk.Button(export_frame, text="Save Project (.rmcs)", command=self.save_project, style="Accent.TButton").pack(pady=10, fill="x")
+        ttk.Button(export_frame, text="Batch Export Project Folder...", command=self.batch_export_projects, style="Accent.TButton").pack(pady=10, fill="x")
+        self.export_progress = ttk.Progressbar(export_frame, orient="horizontal", mode="determinate")
+        self.export_progress.pack(pady=(20, 5), fill="x")
+        self.export_status_label = ttk.Label(export_frame, text="Idle", foreground="grey")
+        self.export_status_label.pack(anchor="w")
+
+        stream_frame = ttk.LabelFrame(export_frame, text="Live Streaming API", padding=10)
+        stream_frame.pack(pady=(30, 10), fill="x")
+        ttk.Label(stream_frame, text="Port or socket path:").grid(row=0, column=0, padx=5, sticky="w")
+        self.stream_address_entry = ttk.Entry(stream_frame, width=30)
+        self.stream_address_entry.insert(0, str(STREAM_CONFIG["port"]))
+        self.stream_address_entry.grid(row=0, column=1, padx=5, sticky="w")
+        self.stream_button = ttk.Button(stream_frame, text="Start Streaming", command=self.toggle_stream_server)
+        self.stream_button.grid(row=0, column=2, padx=5)
+        ttk.Label(stream_frame, text="Session token:").grid(row=1, column=0, padx=5, pady=(5, 0), sticky="w")
+        self.stream_token_entry = ttk.Entry(stream_frame, width=30, state="readonly")
+        self.stream_token_entry.grid(row=1, column=1, padx=5, pady=(5, 0), sticky="w")
+        self.stream_status_label = ttk.Label(stream_frame, text="Stopped", foreground="grey")
+        self.stream_status_label.grid(row=2, column=0, columnspan=3, padx=5, pady=(5, 0), sticky="w")
 
     def update_title(self, *args):
         config = self.config_var.get()
@@ -353,8 +1341,10 @@ class RMCSApp(tk.Tk):
             self.manual_measurement_active = True
             self.send_command(f"GETDATA:{m}")
             
-            manual_row_id = "manual_" + str(len(self.tree.get_children()))
+            manual_row_id = f"manual_{self.manual_row_counter}"
+            self.manual_row_counter += 1
             self.tree.insert("", "end", iid=manual_row_id, values=("Manual", a, b, m, n, "", "", "", "Measuring..."))
+            self.trim_manual_rows()
             
             try:
                 duration = int(self.timer_spinbox.get())
@@ -428,14 +1418,23 @@ class RMCSApp(tk.Tk):
         
         print(f"🚀  Starting automatic measurement sequence with {len(self.measurement_sequence)} steps")
         
+        journal_error = self.open_journal()
+        if journal_error:
+            if self.monitor_var.get():
+                return messagebox.showerror("Journal Error", f"Cannot open the measurement journal:\n{journal_error}\n\nMonitoring mode needs the journal; the sequence was not started.")
+            messagebox.showwarning("Journal Error", f"Cannot open the measurement journal:\n{journal_error}\n\nReadings will not be saved to disk.")
+
         self.reset_plot()
         self.is_running = True
         self.current_step = 0
+        self.monitor_cycle = 0
         self.progress_bar['maximum'] = len(self.measurement_sequence)
         self.progress_bar['value'] = 0
         self.execute_next_step()
 
     def execute_next_step(self):
+        if self.is_running and self.monitor_var.get() and self.measurement_sequence and self.current_step >= len(self.measurement_sequence):
+            self.start_next_cycle()
         if not self.is_running or self.current_step >= len(self.measurement_sequence):
             return self.finish_measurement()
         try:
@@ -460,9 +1459,12 @@ class RMCSApp(tk.Tk):
 
         self.countdown_label.config(foreground="black")
         self.update_countdown(duration)
-        self.after(duration * 1000, self.process_step_result)
+        self.step_job = self.after(duration * 1000, self.process_step_result)
 
     def process_step_result(self):
+        self.step_job = None
+        if not self.is_running or self.current_step >= len(self.measurement_sequence):
+            return
         step_data = self.measurement_sequence[self.current_step]
         a, b, m, n = step_data['A'], step_data['B'], step_data['M'], step_data['N']
         
@@ -473,21 +1475,55 @@ class RMCSApp(tk.Tk):
 
         self.progress_bar['value'] = self.current_step + 1
         self.current_step += 1
-        self.after(500, self.execute_next_step)
+        self.step_job = self.after(500, self.execute_next_step)
+
+    def start_next_cycle(self):
+        self.monitor_cycle += 1
+        self.current_step = 0
+        self.progress_bar['value'] = 0
+        print(f"🔁  Monitoring mode - starting cycle {self.monitor_cycle + 1}")
 
     def finish_measurement(self):
         self.is_running = False
         print("🏁  Automatic measurement sequence completed")
+        if self.stream_server:
+            self.stream_server.publish({"type": "event", "event": "sequence_finished", "t": time.time()})
         messagebox.showinfo("Completed", "Measurement sequence has been completed.")
         self.countdown_label.config(text="0", foreground="grey")
         if self.mode_var.get() == "Otomatis":
             self.a_label.config(text="A0"); self.b_label.config(text="B0")
             self.m_label.config(text="M0"); self.n_label.config(text="N0")
 
+    def stop_measurement_sequence(self):
+        """End a running (or looping) sequence: cancel the pending step and switch its electrodes off.
+
+        The loaded sequence is kept, so it can be started again.
+        """
+        if self.step_job:
+            self.after_cancel(self.step_job)
+            self.step_job = None
+        if not self.is_running:
+            return
+        self.is_running = False
+        print(f"🛑  Stopping automatic measurement at step {self.current_step + 1} (cycle {self.monitor_cycle + 1})")
+        if self.countdown_job:
+            self.after_cancel(self.countdown_job)
+            self.countdown_job = None
+        self.countdown_label.config(text="0", foreground="grey")
+        if self.current_step < len(self.measurement_sequence):
+            step_data = self.measurement_sequence[self.current_step]
+            for key in ('A', 'B', 'M', 'N'):
+                self.send_command(f"OFF:{step_data[key]}")
+            if self.tree.exists(self.current_step) and self.tree.item(self.current_step)["values"][8] == "Measuring...":
+                self.tree.item(self.current_step, values=(*self.tree.item(self.current_step)["values"][:8], "Stopped"))
+        if self.stream_server:
+            self.stream_server.publish({"type": "event", "event": "sequence_stopped", "t": time.time()})
+        print("✅  Automatic measurement stopped")
+
     def reset_all(self):
         print("🔄  Resetting all systems")
         
-        self.is_running = False
+        self.stop_measurement_sequence()
         self.manual_measurement_active = False
         
         if self.countdown_job:
@@ -502,6 +1538,8 @@ class RMCSApp(tk.Tk):
 
         self.last_manual_electrodes = {'A': None, 'B': None, 'M': None, 'N': None}
         self.progress_bar['value'] = 0
+        self.monitor_cycle = 0
+        self.close_journal()
         
         if self.measurement_sequence:
             for i in self.tree.get_children(): self.tree.delete(i)
@@ -514,9 +1552,82 @@ class RMCSApp(tk.Tk):
         
         print("✅  System reset completed")
 
+    def trim_manual_rows(self):
+        manual_rows = [row_id for row_id in self.tree.get_children() if str(row_id).startswith("manual_")]
+        excess = len(manual_rows) - HISTORY_CONFIG["table_max_rows"]
+        if excess > 0:
+            self.tree.delete(*manual_rows[:excess])
+
+    def open_journal(self):
+        """Start a new journal file; returns an error message, or None on success."""
+        self.close_journal()
+        filename = f"{self.project_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.journal.csv"
+        try:
+            journal_path = os.path.join(journal_directory(), filename)
+            self.journal_file = open(journal_path, "w", newline="", encoding="utf-8")
+            self.journal_path = journal_path
+            self.journal_writer = csv.writer(self.journal_file)
+            self.journal_writer.writerow(JOURNAL_COLUMNS)
+            self.journal_file.flush()
+            print(f"📓  Journal opened - {self.journal_path}")
+            if self.loaded_project_path:
+                self.close_loaded_project()
+            return None
+        except OSError as e:
+            self.close_journal()
+            print(f"❌  Cannot open journal - {e}")
+            return str(e)
+
+    def current_data_source(self):
+        """Path of the data currently shown: the opened project, else the session journal (flushed)."""
+        if self.loaded_project_path:
+            return self.loaded_project_path
+        if self.journal_file:
+            self.journal_file.flush()
+        return self.journal_path
+
+    def close_loaded_project(self):
+        project_rows = [row_id for row_id in self.tree.get_children() if str(row_id).startswith("project_")]
+        if project_rows:
+            self.tree.delete(*project_rows)
+        self.reset_plot()
+        print(f"📂  Project closed - {self.loaded_project_path}")
+        self.loaded_project_path = None
+
+    def close_journal(self):
+        if self.journal_file:
+            self.journal_file.close()
+            print(f"📓  Journal closed - {self.journal_path}")
+        self.journal_file = None
+        self.journal_writer = None
+
+    def record_measurement(self, step, a, b, m, n, real_curr, real_volt, K, resistivity):
+        timestamp = datetime.now()
+        if self.stream_server:
+            self.stream_server.publish({"type": "data", "t": timestamp.timestamp(), "mode": "manual" if step == "Manual" else "auto",
+                                        "cycle": self.monitor_cycle, "step": 0 if step == "Manual" else step,
+                                        "a": a, "b": b, "m": m, "n": n, "i": real_curr, "v": real_volt,
+                                        "k": K, "rho": resistivity, "cfg": self.config_var.get()})
+        if self.journal_file is None:
+            journal_error = self.open_journal()
+            if journal_error:
+                return messagebox.showwarning("Journal Error", f"Cannot open the measurement journal:\n{journal_error}\n\nThis reading was not saved to disk.")
+        try:
+            self.journal_writer.writerow([timestamp.isoformat(timespec="milliseconds"), self.monitor_cycle, step,
+                                          a, b, m, n, real_curr, real_volt, K, resistivity, self.config_var.get()])
+            self.journal_file.flush()
+        except OSError as e:
+            print(f"❌  Failed to write journal - {e}")
+            self.close_journal()
+            if self.is_running and self.monitor_var.get():
+                self.stop_measurement_sequence()
+                return messagebox.showerror("Journal Error", f"Failed to write the measurement journal:\n{e}\n\nMonitoring was stopped.")
+            messagebox.showerror("Journal Error", f"Failed to write the measurement journal:\n{e}")
+
     def update_plot(self):
+        plot_x, plot_y = downsample_lttb(list(self.plot_data_x), list(self.plot_data_y), HISTORY_CONFIG["plot_max_points"])
         self.plot_axes.clear()
-        self.plot_axes.plot(self.plot_data_x, self.plot_data_y, marker='o', linestyle='-')
+        self.plot_axes.plot(plot_x, plot_y, marker='o', linestyle='-')
         self.plot_axes.set_title("Apparent Resistivity Profile")
         self.plot_axes.set_xlabel("Measurement Point")
         self.plot_axes.set_ylabel("Apparent Resistivity (Ωm)")
@@ -534,38 +1645,404 @@ class RMCSApp(tk.Tk):
         self.plot_canvas.draw()
 
     def export_to_csv(self):
-        if not self.tree.get_children():
+        source = self.current_data_source()
+        if not source:
             return messagebox.showwarning("Warning", "No data to export.")
+        if self.export_futures:
+            return messagebox.showwarning("Warning", "An export is already in progress.")
         default_name = f"{self.project_name}_Data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
         filepath = filedialog.asksaveasfilename(initialfile=default_name, defaultextension=".csv", filetypes=[("CSV files", "*.csv"), ("All files", "*.*")], title="Save Data as CSV")
         if not filepath: return
-        try:
-            with open(filepath, "w", newline="", encoding="utf-8") as f:
-                writer = csv.writer(f, delimiter=';')
-                writer.writerow([self.tree.heading(col)["text"] for col in self.tree["columns"]])
-                for row_id in self.tree.get_children():
-                    writer.writerow(self.tree.item(row_id)["values"])
-            messagebox.showinfo("Success", f"Data successfully saved to:\n{filepath}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to save file:\n{e}")
+        self.submit_export_jobs([(export_survey_csv, filepath, source)], "Exporting CSV",
+                                lambda results: messagebox.showinfo("Success", f"Data successfully saved to:\n{filepath}"))
 
     def save_plot_image(self):
         if not self.plot_data_x:
             return messagebox.showwarning("Warning", "No plot to save.")
+        if self.export_futures:
+            return messagebox.showwarning("Warning", "An export is already in progress.")
         config_type = self.config_var.get()
         default_name = f"{self.project_name}_Plot_{config_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
         filepath = filedialog.asksaveasfilename(initialfile=default_name, defaultextension=".png", filetypes=[("PNG Image", "*.png"), ("JPEG Image", "*.jpg"), ("All files", "*.*")], title="Save Plot Image")
         if not filepath: return
+        self.submit_export_jobs([(render_plot_image, filepath, list(self.plot_data_x), list(self.plot_data_y))], "Rendering plot",
+                                lambda results: messagebox.showinfo("Success", f"Plot successfully saved to:\n{filepath}"))
+
+    def batch_export_projects(self):
+        if self.export_futures:
+            return messagebox.showwarning("Warning", "An export is already in progress.")
+        folder = filedialog.askdirectory(title="Select Project Folder")
+        if not folder: return
+        output_dir = os.path.join(folder, "reports")
+        project_paths = []
+        for root, dirs, files in os.walk(folder):
+            dirs[:] = [d for d in dirs if os.path.join(root, d) != output_dir]
+            project_paths.extend(os.path.join(root, name) for name in sorted(files) if name.lower().endswith(".rmcs"))
+        if not project_paths:
+            return messagebox.showwarning("Warning", f"No .rmcs projects found in:\n{folder}")
+        # Name reports after the path below the selected folder so same-named projects in subfolders don't collide
+        report_names = [os.path.splitext(os.path.relpath(path, folder))[0].replace(os.sep, "__") for path in project_paths]
+        seen, duplicates = set(), set()
+        for name in report_names:
+            (duplicates if name.lower() in seen else seen).add(name.lower())
+        if duplicates:
+            return messagebox.showerror("Error", "Several projects map to the same report name:\n" + "\n".join(sorted(duplicates)))
         try:
-            self.plot_figure.savefig(filepath, dpi=300)
-            messagebox.showinfo("Success", f"Plot successfully saved to:\n{filepath}")
+            os.makedirs(output_dir, exist_ok=True)
+        except OSError as e:
+            return messagebox.showerror("Error", f"Cannot create report folder:\n{e}")
+        print(f"🗂️   Batch export of {len(project_paths)} projects to {output_dir}")
+        self.submit_export_jobs([(export_project_report, path, output_dir, name) for path, name in zip(project_paths, report_names)], "Batch export",
+                                lambda results: messagebox.showinfo("Success", f"{len(results)} project reports saved to:\n{output_dir}"))
+
+    def submit_export_jobs(self, jobs, description, on_done):
+        if self.export_executor is None:
+            # Spawn rather than fork: forking a process that owns a Tk interpreter and a serial thread is unsafe
+            self.export_executor = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=multiprocessing.get_context("spawn"))
+        self.export_futures = [self.export_executor.submit(*job) for job in jobs]
+        self.export_description = description
+        self.export_on_done = on_done
+        self.export_progress['maximum'] = len(jobs)
+        self.export_progress['value'] = 0
+        self.export_status_label.config(text=f"{description}: 0/{len(jobs)}", foreground="black")
+        self.after(200, self.poll_export_jobs)
+
+    def poll_export_jobs(self):
+        if not self.export_futures:
+            return
+        done_count = sum(future.done() for future in self.export_futures)
+        self.export_progress['value'] = done_count
+        self.export_status_label.config(text=f"{self.export_description}: {done_count}/{len(self.export_futures)}")
+        if done_count < len(self.export_futures):
+            self.after(200, self.poll_export_jobs)
+            return
+
+        futures, on_done = self.export_futures, self.export_on_done
+        self.export_futures = []
+        self.export_on_done = None
+        errors = [future.exception() for future in futures if future.exception() is not None]
+        results = [future.result() for future in futures if future.exception() is None]
+        if any(isinstance(e, BrokenProcessPool) for e in errors) and self.export_executor:
+            self.export_executor.shutdown(wait=False, cancel_futures=True)
+            self.export_executor = None
+        self.export_status_label.config(text=f"{self.export_description}: finished ({len(results)} ok, {len(errors)} failed)",
+                                        foreground="red" if errors else "green")
+        print(f"📤  {self.export_description} finished - {len(results)} ok, {len(errors)} failed")
+        if errors:
+            details = "\n".join(str(e) for e in errors[:5])
+            messagebox.showerror("Error", f"{len(errors)} of {len(futures)} export jobs failed:\n{details}")
+        if results:
+            on_done(results)
+
+    def save_project(self):
+        if not self.journal_path:
+            return messagebox.showwarning("Warning", "No measurement data to save.")
+        if self.journal_file:
+            self.journal_file.flush()
+        default_name = f"{self.project_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.rmcs"
+        filepath = filedialog.asksaveasfilename(initialfile=default_name, defaultextension=".rmcs", filetypes=[("RMCS Project", "*.rmcs"), ("All files", "*.*")], title="Save Project")
+        if not filepath: return
+        try:
+            columns = read_journal(self.journal_path)
+            metadata = {
+                "project_name": self.project_name,
+                "config": self.config_var.get(),
+                "base_spacing": self.base_spacing,
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "journal": os.path.basename(self.journal_path),
+            }
+            write_project(filepath, metadata, columns)
+            print(f"💾  Project saved - {len(columns['timestamp'])} records to {filepath}")
+            messagebox.showinfo("Success", f"Project successfully saved to:\n{filepath}")
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to save image:\n{e}")
+            messagebox.showerror("Error", f"Failed to save project:\n{e}")
+
+    def open_project(self):
+        if self.is_running or self.manual_measurement_active:
+            return messagebox.showwarning("Warning", "Stop the running measurement before opening a project.")
+        filepath = filedialog.askopenfilename(title="Open Project", filetypes=(("RMCS Project", "*.rmcs"), ("All files", "*.*")))
+        if not filepath: return
+        try:
+            with ProjectFile(filepath) as project:
+                # The opened project replaces the session: later readings start a new journal
+                self.close_journal()
+                self.journal_path = None
+                self.measurement_sequence = []
+                for i in self.tree.get_children():
+                    self.tree.delete(i)
+                self.reset_plot()
+
+                metadata = project.metadata
+                self.project_name = metadata.get("project_name", self.project_name)
+                self.project_name_entry.delete(0, tk.END)
+                self.project_name_entry.insert(0, self.project_name)
+                self.base_spacing = float(metadata.get("base_spacing", self.base_spacing))
+                if metadata.get("config") in PROJECT_CONFIG_NAMES:
+                    self.config_var.set(metadata["config"])
+
+                steps = project.column("step")
+                elec_a, elec_b = project.column("A"), project.column("B")
+                elec_m, elec_n = project.column("M"), project.column("N")
+                current, voltage = project.column("current_mA"), project.column("voltage_mV")
+                resistivity = project.column("resistivity_ohm_m")
+
+                for idx in range(max(0, project.rows - HISTORY_CONFIG["table_max_rows"]), project.rows):
+                    curr_str = f"{current[idx]:.2f}".replace('.', ',')
+                    volt_str = f"{voltage[idx]:.2f}".replace('.', ',')
+                    res_str = f"{resistivity[idx]:.2f}".replace('.', ',')
+                    label = steps[idx] if steps[idx] else "Manual"
+                    self.tree.insert("", "end", iid=f"project_{idx}", values=(label, elec_a[idx], elec_b[idx], elec_m[idx], elec_n[idx], curr_str, volt_str, res_str, "Done"))
 
-    def populate_com_ports(self):
-        ports = [port.device for port in serial.tools.list_ports.comports()]
+                for idx in range(max(0, project.rows - HISTORY_CONFIG["plot_buffer_size"]), project.rows):
+                    self.plot_data_x.append(idx + 1)
+                    self.plot_data_y.append(resistivity[idx])
+                rows = project.rows
+
+            self.loaded_project_path = filepath
+            self.update_title()
+            if self.plot_data_x:
+                self.update_plot()
+            print(f"📂  Project opened - {rows} records from {filepath}")
+        except FileNotFoundError:
+            messagebox.showerror("Error", f"File not found:\n{filepath}")
+        except (ValueError, KeyError) as e:
+            messagebox.showerror("File Format Error", f"Error occurred while reading project:\n{e}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Unexpected error occurred:\n{e}")
+
+    def toggle_stream_server(self):
+        if self.stream_server:
+            return self.stop_stream_server()
+        address = self.stream_address_entry.get().strip()
+        try:
+            if address.isdigit():
+                server = StreamServer(self.stream_commands, port=int(address))
+            elif address and hasattr(socket, "AF_UNIX"):
+                server = StreamServer(self.stream_commands, unix_path=address)
+            else:
+                raise ValueError("Enter a TCP port number" + (" or a Unix socket path." if hasattr(socket, "AF_UNIX") else "."))
+            server.start()
+        except (ValueError, OSError) as e:
+            return messagebox.showerror("Streaming Error", f"Failed to start streaming server:\n{e}")
+        self.stream_server = server
+        self.stream_button.config(text="Stop Streaming")
+        self.set_stream_token(server.token)
+        print(f"📡  Streaming server listening on {server.address}")
+
+    def stop_stream_server(self):
+        if self.stream_server:
+            self.stream_server.stop()
+            print(f"📡  Streaming server on {self.stream_server.address} stopped")
+        self.stream_server = None
+        self.stream_button.config(text="Start Streaming")
+        self.stream_status_label.config(text="Stopped", foreground="grey")
+        self.set_stream_token("")
+
+    def set_stream_token(self, token):
+        self.stream_token_entry.config(state="normal")
+        self.stream_token_entry.delete(0, tk.END)
+        self.stream_token_entry.insert(0, token)
+        self.stream_token_entry.config(state="readonly")
+
+    def process_stream_commands(self):
+        try:
+            while not self.stream_commands.empty():
+                client_id, command = self.stream_commands.get_nowait()
+                print(f"📡  Remote command from subscriber #{client_id}: {command}")
+                reply = {"type": "reply", "cmd": command.get("cmd"), "id": command.get("id")}
+                error = self.handle_stream_command(command)
+                reply.update({"ok": error is None, "error": error})
+                if command.get("cmd") == "status":
+                    reply["state"] = {"connected": self.is_connected, "running": self.is_running,
+                                      "manual_active": self.manual_measurement_active, "mode": self.mode_var.get(),
+                                      "config": self.config_var.get(), "step": self.current_step, "cycle": self.monitor_cycle,
+                                      "steps": len(self.measurement_sequence), "project": self.project_name}
+                if self.stream_server:
+                    self.stream_server.send_to(client_id, reply)
+            if self.stream_server:
+                server = self.stream_server
+                status = f"Listening on {server.address} - {server.subscriber_count} subscribers, {server.published} published, {server.total_dropped} dropped"
+                if self.stream_status_label.cget("text") != status:
+                    self.stream_status_label.config(text=status, foreground="green")
+        finally:
+            self.after(100, self.process_stream_commands)
+
+    def handle_stream_command(self, command):
+        """Run a remote control command on the Tk thread; returns an error message or None."""
+        cmd = command.get("cmd")
+        if cmd == "status":
+            return None
+        if cmd == "start":
+            if self.mode_var.get() == "Manual":
+                return "Switch to 'Automatic Mode' to start sequence."
+            if not self.is_connected:
+                return "Not connected to device."
+            if not self.measurement_sequence:
+                return "No measurement sequence loaded (Load CMD)."
+            if self.is_running:
+                return "Measurement is already running."
+            self.start_measurement_sequence()
+            return None
+        if cmd == "stop":
+            if not self.is_running:
+                return "No measurement sequence is running."
+            self.stop_measurement_sequence()
+            return None
+        if cmd == "reset":
+            self.reset_all()
+            return None
+        if cmd == "manual":
+            if self.mode_var.get() != "Manual":
+                return "Switch to 'Manual Mode' to send manual measurements."
+            if self.is_running:
+                return "Measurement is already running."
+            if not self.is_connected:
+                return "Not connected to device."
+            if self.manual_measurement_active:
+                return "Manual measurement is already in progress."
+            try:
+                electrodes = [int(command[key]) for key in ("a", "b", "m", "n")]
+            except (KeyError, TypeError, ValueError):
+                return "Manual command needs integer fields a, b, m and n."
+            if not all(1 <= x <= 64 for x in electrodes):
+                return "Electrode values must be between 1-64"
+            for entry, value in zip((self.a_entry, self.b_entry, self.m_entry, self.n_entry), electrodes):
+                entry.set(str(value))
+            self.send_manual_measurement()
+            return None
+        if cmd == "stop_manual":
+            self.stop_manual_measurement()
+            return None
+        return f"Unknown command: {cmd}"
+
+    def start_port_watcher(self):
+        self.port_watcher = PortWatcher(self.port_events)
+        self.port_watcher.start()
+
+    def process_port_events(self):
+        try:
+            while not self.port_events.empty():
+                event, *payload = self.port_events.get_nowait()
+                if event == "ports":
+                    self.populate_com_ports(payload[0])
+                elif event == "detected":
+                    self.finish_auto_connect(*payload)
+        finally:
+            self.after(200, self.process_port_events)
+
+    def run_inversion(self):
+        if not HAS_SCIPY:
+            return messagebox.showerror("Error", "Inversion requires SciPy.\nInstall it with: pip install scipy")
+        if self.inversion_future:
+            return messagebox.showwarning("Warning", "Inversion is already running.")
+        source = self.current_data_source()
+        if not source:
+            return messagebox.showwarning("Warning", "No measurement data to invert.")
+        if self.inversion_executor is None:
+            self.inversion_executor = ThreadPoolExecutor(max_workers=1)
+        progress = lambda iteration, rms: self.inversion_messages.put(f"Iteration {iteration}: RMS {rms:.1f}%")
+        self.inversion_future = self.inversion_executor.submit(run_survey_inversion, source, self.base_spacing, progress)
+        self.inversion_button.config(state="disabled")
+        self.inversion_status_label.config(text="Running inversion...", foreground="black")
+        print(f"🧮  Inversion started - {source}")
+        self.after(200, self.poll_inversion)
+
+    def poll_inversion(self):
+        while not self.inversion_messages.empty():
+            self.inversion_status_label.config(text=self.inversion_messages.get_nowait())
+        if not self.inversion_future.done():
+            self.after(200, self.poll_inversion)
+            return
+        future, self.inversion_future = self.inversion_future, None
+        self.inversion_button.config(state="normal")
+        error = future.exception()
+        if error is not None:
+            self.inversion_status_label.config(text="Inversion failed", foreground="red")
+            print(f"❌  Inversion failed - {error}")
+            return messagebox.showerror("Inversion Error", f"Inversion failed:\n{error}")
+        result = future.result()
+        iterations = len(result["rms_history"]) - 1
+        summary = f"{result['data_count']} data, {iterations} iterations, RMS {result['rms_history'][-1]:.1f}%, {result['elapsed']:.1f} s"
+        self.inversion_status_label.config(text=summary, foreground="green")
+        print(f"🧮  Inversion completed - {summary}")
+        self.draw_inversion_result(result)
+        self.notebook.select(self.inversion_canvas.get_tk_widget().master)
+
+    def draw_inversion_result(self, result):
+        if self.inversion_colorbar:
+            self.inversion_colorbar.remove()
+        self.inversion_axes.clear()
+        resistivity = result["resistivity"]
+        mesh = self.inversion_axes.pcolormesh(result["x_edges"], result["z_edges"], resistivity, cmap="jet",
+                                              norm=LogNorm(vmin=resistivity.min(), vmax=resistivity.max()))
+        self.inversion_axes.plot(result["electrode_x"], np.zeros(len(result["electrode_x"])), "kv", markersize=4, clip_on=False)
+        self.inversion_axes.set_ylim(result["z_edges"][-1], 0)
+        self.inversion_axes.set_title(f"Inverted Resistivity Model - RMS {result['rms_history'][-1]:.1f}%")
+        self.inversion_axes.set_xlabel("Distance (m)")
+        self.inversion_axes.set_ylabel("Depth (m)")
+        self.inversion_colorbar = self.inversion_figure.colorbar(mesh, ax=self.inversion_axes, label="Resistivity (Ωm)")
+        self.inversion_canvas.draw()
+
+    def populate_com_ports(self, ports):
+        previous_ports = set(self.com_port_combo['values'])
+        selected = self.com_port_combo.get()
         self.com_port_combo['values'] = ports
-        if ports: self.com_port_combo.current(0)
+        if selected in ports:
+            self.com_port_combo.set(selected)
+        elif ports:
+            self.com_port_combo.current(0)
+        else:
+            self.com_port_combo.set("")
+        added, removed = set(ports) - previous_ports, previous_ports - set(ports)
+        if added or removed:
+            print(f"🔌  COM ports changed - added: {sorted(added) or '-'}, removed: {sorted(removed) or '-'}")
+        if self.is_connected and self.serial_port and self.serial_port.port in removed:
+            print(f"⚠️   Connected port {self.serial_port.port} was removed")
+            self.disconnect()
+            messagebox.showwarning("Warning", "The connected COM port was unplugged.")
+
+    def auto_connect(self):
+        if self.is_connected:
+            return messagebox.showwarning("Warning", "Already connected to device.")
+        if self.auto_connect_active:
+            return
+        ports = list(self.com_port_combo['values'])
+        if not ports:
+            return messagebox.showwarning("Warning", "No COM ports found.")
+        preferred = self.baud_rate_combo.get()
+        baud_rates = [preferred] if preferred.isdigit() else []
+        baud_rates += [baud for baud in PORT_DISCOVERY_CONFIG["baud_rates"] if baud != preferred]
+        self.auto_connect_active = True
+        self.auto_connect_button.config(state="disabled")
+        self.status_label.config(text="Searching...", foreground="orange")
+        print(f"🔍  Auto connect - probing {len(ports)} ports at {', '.join(baud_rates)} baud")
+        threading.Thread(target=self.detect_master_worker, args=(ports, baud_rates), daemon=True).start()
+
+    def detect_master_worker(self, ports, baud_rates):
+        """Always reports back, so a failed search can never leave Auto Connect disabled."""
+        port, baud = None, None
+        try:
+            port, baud = detect_master(ports, baud_rates)
+        except Exception as e:
+            print(f"❌  Auto connect failed - {e}")
+        finally:
+            self.port_events.put(("detected", port, baud))
+
+    def finish_auto_connect(self, port, baud):
+        self.auto_connect_active = False
+        self.auto_connect_button.config(state="normal")
+        if self.is_connected:
+            return
+        self.status_label.config(text="Not ready", foreground="red")
+        if not port:
+            print("❌  Auto connect - no Master responded")
+            return messagebox.showwarning("Warning", "No Master responded on any COM port.\n\n"
+                                          f"Auto Connect sends '{PORT_DISCOVERY_CONFIG['handshake_command']}' and expects a reply matching "
+                                          f"'{PORT_DISCOVERY_CONFIG['handshake_reply']}'. Master firmware without this handshake "
+                                          "must be connected manually with \"Connect\".")
+        self.com_port_combo.set(port)
+        self.baud_rate_combo.set(baud)
+        self.connect()
             
     def toggle_connection(self):
         if not self.is_connected: self.connect()
@@ -587,7 +2064,7 @@ class RMCSApp(tk.Tk):
             print(f"❌  Connection failed - {e}")
 
     def disconnect(self):
-        self.is_running = False
+        self.stop_measurement_sequence()
         self.manual_measurement_active = False
         if self.serial_port: self.serial_port.close()
         self.serial_port = None
@@ -635,7 +2112,9 @@ class RMCSApp(tk.Tk):
                                         current_values = self.tree.item(row_id)["values"]
                                         if current_values[8] == "Measuring...":
                                             a, b, m, n = int(current_values[1]), int(current_values[2]), int(current_values[3]), int(current_values[4])
-                                            resistivity = self.calculate_resistivity(a, b, m, n, resistance)
+                                            K = self.calculate_geometric_factor(a, b, m, n)
+                                            resistivity = self.calculate_resistivity(K, resistance)
+                                            self.record_measurement("Manual", a, b, m, n, real_curr, real_volt, K, resistivity)
                                             
                                             curr_str = f"{real_curr:.2f}".replace('.', ',')
                                             volt_str = f"{real_volt:.2f}".replace('.', ',')
@@ -648,7 +2127,9 @@ class RMCSApp(tk.Tk):
                                 if self.current_step < len(self.measurement_sequence):
                                     step_data = self.measurement_sequence[self.current_step]
                                     a, b, m, n = step_data['A'], step_data['B'], step_data['M'], step_data['N']
-                                    resistivity = self.calculate_resistivity(a, b, m, n, resistance)
+                                    K = self.calculate_geometric_factor(a, b, m, n)
+                                    resistivity = self.calculate_resistivity(K, resistance)
+                                    self.record_measurement(self.current_step + 1, a, b, m, n, real_curr, real_volt, K, resistivity)
                                     
                                     curr_str = f"{real_curr:.2f}".replace('.', ',')
                                     volt_str = f"{real_volt:.2f}".replace('.', ',')
@@ -656,7 +2137,7 @@ class RMCSApp(tk.Tk):
 
                                     self.tree.item(self.current_step, values=(self.current_step + 1, a, b, m, n, curr_str, volt_str, res_str, "Done"))
                                     
-                                    self.plot_data_x.append(self.current_step + 1)
+                                    self.plot_data_x.append(self.monitor_cycle * len(self.measurement_sequence) + self.current_step + 1)
                                     self.plot_data_y.append(resistivity)
                                     self.update_plot()
                                     print(f"📊  Automatic measurement data processed - Step {self.current_step + 1}, Resistivity: {resistivity:.2f} Ωm")
@@ -666,7 +2147,7 @@ class RMCSApp(tk.Tk):
         finally:
             self.after(100, self.process_serial_queue)
 
-    def calculate_resistivity(self, a, b, m, n, resistance):
+    def calculate_geometric_factor(self, a, b, m, n):
         config_type = self.config_var.get()
         K = 0.0
         
@@ -682,12 +2163,16 @@ class RMCSApp(tk.Tk):
             print(f"🧮  Schlumberger calculation - AB: {ab_dist}, MN: {mn_dist}, K: {K:.2f}")
         elif config_type == "Dipole-dipole":
             a_spacing = abs(b - a) * self.base_spacing
+            n_factor = 0.0
             dipole_center_dist = abs(((m+n)/2) - ((a+b)/2)) * self.base_spacing
             if a_spacing > 0:
                 n_factor = dipole_center_dist / a_spacing
                 K = math.pi * n_factor * (n_factor + 1) * (n_factor + 2) * a_spacing
             print(f"🧮  Dipole-dipole calculation - a_spacing: {a_spacing}, n_factor: {n_factor:.2f}, K: {K:.2f}")
         
+        return K
+
+    def calculate_resistivity(self, K, resistance):
         resistivity = K * resistance
         print(f"🧮  Final resistivity calculation - K: {K:.2f}, R: {resistance:.2f}, ρ: {resistivity:.2f} Ωm")
         return resistivity
@@ -759,10 +2244,21 @@ class RMCSApp(tk.Tk):
         if messagebox.askokcancel("Exit", "Are you sure you want to exit?"):
             print("🚪  Application closing")
             self.disconnect()
+            self.close_journal()
+            self.stop_stream_server()
+            if self.port_watcher:
+                self.port_watcher.stop()
+            if self.inversion_executor:
+                self.inversion_executor.shutdown(wait=False)
+            if self.export_executor:
+                for future in self.export_futures:
+                    future.cancel()
+                self.export_executor.shutdown(wait=False)
             self.destroy()
 
 if __name__ == "__main__":
-    import sys
+    # Export workers re-import this module; required for the PyInstaller one-file build
+    multiprocessing.freeze_support()
     
     # Remove problematic sys.stdout.flush() call
     
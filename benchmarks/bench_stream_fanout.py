@@ -0,0 +1,97 @@
+"""Fan-out throughput benchmark for the RMCS live streaming API.
+
+Starts a StreamServer on an ephemeral localhost port, connects N subscribers that
+just count received lines, publishes DATA-shaped messages as fast as possible and
+reports publish cost, delivered messages per second and dropped messages.
+
+Usage:
+    python benchmarks/bench_stream_fanout.py --subscribers 1 10 100 --messages 20000
+"""
+import argparse
+import contextlib
+import io
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from RMCS_App import StreamServer
+
+
+def count_lines(sock, counter, index, stop):
+    sock.settimeout(0.2)
+    while not stop.is_set():
+        try:
+            data = sock.recv(65536)
+        except socket.timeout:
+            continue
+        except OSError:
+            break
+        if not data:
+            break
+        counter[index] += data.count(b"\n")
+
+
+def run(subscribers, messages, buffer_size):
+    # Silence the server's per-connection log lines so only the summary is printed
+    with contextlib.redirect_stdout(io.StringIO()):
+        server, delivered, publish_time, elapsed = fan_out(subscribers, messages, buffer_size)
+    print(f"{subscribers:>5} subscribers | publish {publish_time / messages * 1e6:7.2f} us/msg | "
+          f"delivered {delivered:>9} lines in {elapsed:6.2f} s ({delivered / elapsed:>10.0f} lines/s) | "
+          f"dropped {server.total_dropped}")
+
+
+def fan_out(subscribers, messages, buffer_size):
+    server = StreamServer(queue.Queue(), port=0, buffer_size=buffer_size)
+    server.start()
+    stop = threading.Event()
+    counter = [0] * subscribers
+    sockets, readers = [], []
+    for index in range(subscribers):
+        sock = socket.create_connection((server.host, server.port))
+        sockets.append(sock)
+        reader = threading.Thread(target=count_lines, args=(sock, counter, index, stop), daemon=True)
+        reader.start()
+        readers.append(reader)
+    while server.subscriber_count < subscribers:
+        time.sleep(0.01)
+
+    message = {"type": "data", "t": 0.0, "mode": "auto", "cycle": 0, "step": 1, "a": 1, "b": 4, "m": 2, "n": 3,
+               "i": 12.34, "v": 56.78, "k": 6.283, "rho": 28.9, "cfg": "Wenner"}
+    start = time.perf_counter()
+    for step in range(messages):
+        message["step"] = step
+        server.publish(message)
+    publish_time = time.perf_counter() - start
+
+    expected = messages * subscribers
+    deadline = time.time() + 30
+    while sum(counter) + server.total_dropped < expected and time.time() < deadline:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    for sock in sockets:
+        sock.close()
+    server.stop()
+
+    # Delivered lines include the {"type": "dropped"} notices sent to slow subscribers
+    return server, sum(counter), publish_time, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[1, 10, 50, 100])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--buffer", type=int, default=1024, help="per-subscriber buffer size (messages)")
+    args = parser.parse_args()
+    for subscribers in args.subscribers:
+        run(subscribers, args.messages, args.buffer)
+
+
+if __name__ == "__main__":
+    main()